@@ -1,76 +1,251 @@
-import random
-import os
+import sys
 import time
-from enum import Enum
+from enum import Enum, IntEnum
+import multiprocessing
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+    _HAS_NUMBA = True
+except ImportError:
+    # Numba is optional, without it the kernels are replaced by their NumPy versions
+    _HAS_NUMBA = False
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda function: function
+    prange = range
 
 # The minimum pheromone in the cell
 MINIMUM_PHEROMONE=0.001
 MINIMUM_EVAPORATE_PHEROMONE=MINIMUM_PHEROMONE*2
 MAXIMUM_PHEROMONE=0.8
+# Rounds that can be left without evaporating while it would do nothing
+MAXIMUM_PENDING_EVAPORATIONS=10
+# ANSI escape codes to move the cursor home and clear the terminal
+_CLEAR_SCREEN="\x1b[H\x1b[2J"
+# Position where the ants start
+_ORIGIN=(0, 0)
+
+class CellType(IntEnum):
+    '''
+    The values are the codes stored in the board arrays
+    '''
+    NORMAL = 0
+    WALL = 1
+    FOOD = 2
+    START = 3
 
-class CellType(Enum):
-    NORMAL = "NORMAL"
-    WALL = "WALL"
-    FOOD = "FOOD"
-    START = "START"
-
-class Reason(Enum):
-    FOOD = "FOOD"
+    # Print CellType.NORMAL instead of the number
+    __str__ = Enum.__str__
 
 class AntBreed(Enum):
     MINOR = "MINOR"
 
+# Plain ints to compare with the board arrays in the hot paths
+_NORMAL, _WALL, _FOOD, _START = CellType.NORMAL.value, CellType.WALL.value, CellType.FOOD.value, CellType.START.value
+# Representation of the cell types that do not depend on the pheromone
+_CELL_TYPE_CHARS = {_WALL: "X", _START: "=", _FOOD: "*"}
+# Representation of the normal cells, from less to more pheromone, and the pheromone where the next one starts
+_PHEROMONE_CHARS = ("░", "▒", "▓", "█")
+_PHEROMONE_BINS = (0.2, 0.4, 0.6)
+_PHEROMONE_LUT = np.array(_PHEROMONE_CHARS)
+
+def _clip_pheromone(pheromone: float) -> float:
+    # Pheromone can not be lower than minimun
+    return MINIMUM_PHEROMONE if pheromone <= MINIMUM_PHEROMONE else (MAXIMUM_PHEROMONE if pheromone > MAXIMUM_PHEROMONE else pheromone)
+
+def _cell_chars(cell_type: np.ndarray, pheromone: np.ndarray) -> np.ndarray:
+    '''
+    Returns the representation of the cells with those type and pheromone arrays
+    '''
+    cell_chars = _PHEROMONE_LUT[np.digitize(pheromone, _PHEROMONE_BINS)]
+    for cell_type_code, cell_char in _CELL_TYPE_CHARS.items():
+        cell_chars[cell_type == cell_type_code] = cell_char
+
+    return cell_chars
+
+def _compute_offsets(jump: int) -> tuple:
+    '''
+    Returns the (x, y) offsets of the neighbours of a cell
+    '''
+    offsets = []
+    for i in range(-jump, jump+1):
+        for j in range(-jump, jump+1):
+            # Diagonal is not a neighbour and the same cell is not a neighbour
+            if (i != 0 and j != 0) or (i == 0 and j == 0):
+                continue
+            offsets.append((i, j))
+
+    return tuple(offsets)
+
+_NEIGHBOUR_OFFSETS = _compute_offsets(1)
+# Offsets already computed for each jump
+_OFFSETS_CACHE = {1: _NEIGHBOUR_OFFSETS}
+
+@njit(parallel=True, cache=True)
+def _move_exploring_ants_jit(positions, exploring, visited, pheromone, cell_type, n, random_numbers):
+    '''
+    Move every exploring ant to a weighted random neighbour cell
+    More probability if there is pheromone
+    Less probability if the ant has gone by there already
+    Returns the number of neighbours of every exploring ant, the ants without neighbours do not move
+    '''
+    count_neighbours = np.zeros(len(exploring), dtype=np.int32)
+    # Weight of every neighbour, 0 if it is not a neighbour
+    weights = np.zeros((len(exploring), len(_NEIGHBOUR_OFFSETS)))
+    for k in prange(len(exploring)):
+        ant = exploring[k]
+        x = positions[ant, 0]
+        y = positions[ant, 1]
+
+        total = 0.0
+        for offset in range(len(_NEIGHBOUR_OFFSETS)):
+            new_x = x + _NEIGHBOUR_OFFSETS[offset][0]
+            new_y = y + _NEIGHBOUR_OFFSETS[offset][1]
+            if 0 <= new_x < n and 0 <= new_y < n and cell_type[new_y, new_x] != _WALL:
+                count_neighbours[k] += 1
+                weights[k, offset] = MINIMUM_PHEROMONE if visited[ant, new_y, new_x] else pheromone[new_y, new_x]
+                total += weights[k, offset]
+
+        # Scan the raw cumulative weights until reaching the random one, there is no need to normalize them
+        threshold = random_numbers[k] * total
+        cumulative = 0.0
+        for offset in range(len(_NEIGHBOUR_OFFSETS)):
+            if weights[k, offset] > 0:
+                cumulative += weights[k, offset]
+                positions[ant, 0] = x + _NEIGHBOUR_OFFSETS[offset][0]
+                positions[ant, 1] = y + _NEIGHBOUR_OFFSETS[offset][1]
+                if threshold < cumulative:
+                    break
+
+    return count_neighbours
+
+@njit(parallel=True, cache=True)
+def _store_positions_jit(positions, moved, visited, path_xs, path_ys, path_sizes):
+    '''
+    Store the new position of every moved ant in its path without cycles
+    '''
+    for k in prange(len(moved)):
+        ant = moved[k]
+        x = positions[ant, 0]
+        y = positions[ant, 1]
+
+        # To make the ant smarter, it will go back to the first time it was in that cell, so it will not cycle
+        if visited[ant, y, x]:
+            top = path_sizes[ant] - 1
+            while path_xs[ant, top] != x or path_ys[ant, top] != y:
+                visited[ant, path_ys[ant, top], path_xs[ant, top]] = False
+                top -= 1
+            path_sizes[ant] = top + 1
+        else:
+            path_xs[ant, path_sizes[ant]] = x
+            path_ys[ant, path_sizes[ant]] = y
+            path_sizes[ant] += 1
+            visited[ant, y, x] = True
+
+def _move_exploring_ants_numpy(positions, exploring, visited, pheromone, cell_type, n, random_numbers):
+    '''
+    Same as _move_exploring_ants_jit, but moving all the exploring ants at once with array operations
+    '''
+    offsets = np.array(_NEIGHBOUR_OFFSETS, dtype=np.int32)
+    # Neighbours of every exploring ant, shape (ants, offsets)
+    neighbour_xs = positions[exploring, 0, None] + offsets[:, 0]
+    neighbour_ys = positions[exploring, 1, None] + offsets[:, 1]
+    inside = (0 <= neighbour_xs) & (neighbour_xs < n) & (0 <= neighbour_ys) & (neighbour_ys < n)
+    neighbour_xs = np.clip(neighbour_xs, 0, n - 1)
+    neighbour_ys = np.clip(neighbour_ys, 0, n - 1)
+    is_open = inside & (cell_type[neighbour_ys, neighbour_xs] != _WALL)
+    count_neighbours = is_open.sum(axis=1).astype(np.int32)
+
+    # Weight of every neighbour, 0 if it is not a neighbour
+    weights = np.where(visited[exploring[:, None], neighbour_ys, neighbour_xs], MINIMUM_PHEROMONE, pheromone[neighbour_ys, neighbour_xs].astype(np.float64))
+    weights[~is_open] = 0
+
+    # Scan the raw cumulative weights until reaching the random one, there is no need to normalize them
+    cumulative = np.cumsum(weights, axis=1)
+    above = cumulative > (random_numbers * cumulative[:, -1])[:, None]
+    # Rounding can leave the random weight above the total, then the last neighbour is chosen
+    last_open = len(_NEIGHBOUR_OFFSETS) - 1 - np.argmax(is_open[:, ::-1], axis=1)
+    choices = np.where(above.any(axis=1), np.argmax(above, axis=1), last_open)
+
+    # The ants without neighbours do not move
+    moving = np.flatnonzero(count_neighbours > 0)
+    positions[exploring[moving], 0] = neighbour_xs[moving, choices[moving]]
+    positions[exploring[moving], 1] = neighbour_ys[moving, choices[moving]]
+
+    return count_neighbours
+
+def _store_positions_numpy(positions, moved, visited, path_xs, path_ys, path_sizes):
+    '''
+    Same as _store_positions_jit, but storing the positions of all the moved ants at once with array operations
+    '''
+    xs = positions[moved, 0]
+    ys = positions[moved, 1]
+    revisited = visited[moved, ys, xs]
+
+    new = moved[~revisited]
+    new_xs, new_ys = xs[~revisited], ys[~revisited]
+    path_xs[new, path_sizes[new]] = new_xs
+    path_ys[new, path_sizes[new]] = new_ys
+    path_sizes[new] += 1
+    visited[new, new_ys, new_xs] = True
+
+    # To make the ant smarter, it will go back to the first time it was in that cell, so it will not cycle
+    back = moved[revisited]
+    if len(back) > 0:
+        steps = np.arange(path_sizes[back].max())
+        in_path = steps < path_sizes[back, None]
+        found = in_path & (path_xs[back, :len(steps)] == xs[revisited, None]) & (path_ys[back, :len(steps)] == ys[revisited, None])
+        tops = np.argmax(found, axis=1)
+        rows, forgotten = np.nonzero(in_path & (steps > tops[:, None]))
+        visited[back[rows], path_ys[back[rows], forgotten], path_xs[back[rows], forgotten]] = False
+        path_sizes[back] = tops + 1
+
+try:
+    # Kernels compiled ahead of time by aco_kernels_build.py, they do not need Numba nor compiling on every run
+    from aco_kernels import move_exploring_ants as _move_exploring_ants, store_positions as _store_positions
+except ImportError:
+    if _HAS_NUMBA:
+        _move_exploring_ants, _store_positions = _move_exploring_ants_jit, _store_positions_jit
+    else:
+        # Without compiling, the loops of the kernels would be much slower than the array operations
+        _move_exploring_ants, _store_positions = _move_exploring_ants_numpy, _store_positions_numpy
+
 class Cell:
     '''
     Class to represent a cell in the board
+    It does not store anything, it reads and writes the board arrays
     '''
-    def __init__(self, x, y, cell_type=CellType.NORMAL) -> None:
+    __slots__ = ('board', 'x', 'y', '_pos')
+
+    def __init__(self, board: 'Board', x: int, y: int) -> None:
+        self.board = board
         self.x = x
         self.y = y
-        self.pheromone = MINIMUM_EVAPORATE_PHEROMONE
-        self.type = cell_type
+        self._pos = (x, y)
     
     def set_type(self, type: CellType) -> None:
-        self.type = type
+        self.board.cell_type[self.y, self.x] = type
     
     def get_type(self) -> CellType:
-        return self.type
+        return CellType(self.board.cell_type[self.y, self.x])
 
     def get_pheromone(self) -> float:
-        return self.pheromone
+        return float(self.board.pheromone[self.y, self.x])
     
     def set_pheromone(self, pheromone: float) -> None:
-        # Pheromone can not be lower than minimun 
-        if MINIMUM_PHEROMONE < pheromone <= MAXIMUM_PHEROMONE:
-            self.pheromone = pheromone
-        elif pheromone <= MINIMUM_PHEROMONE:
-            self.pheromone = MINIMUM_PHEROMONE
-        elif pheromone > MAXIMUM_PHEROMONE:
-            self.pheromone = MAXIMUM_PHEROMONE
+        self.board.pheromone[self.y, self.x] = _clip_pheromone(pheromone)
 
     def get_position(self) -> tuple:
-        return (self.x, self.y)
+        return self._pos
     
     def __repr__(self) -> str:
-        return "(" + str(self.x) + ", " + str(self.y) + ", " + str(self.type) + ")"
+        return "(" + str(self.x) + ", " + str(self.y) + ", " + str(self.get_type()) + ")"
 
     def __str__(self) -> str:
-        representation = "X"
-        if self.type == CellType.NORMAL:
-            if self.pheromone < 0.2:
-                representation = "░"
-            elif 0.2 <= self.pheromone < 0.4:
-                representation = "▒"
-            elif 0.4 <= self.pheromone < 0.6:
-                representation = "▓"
-            else:
-                representation =  "█"
-        elif self.type == CellType.START:
-            representation =  "="
-        elif self.type == CellType.FOOD:
-            representation =  "*"
-
-        return representation
+        return str(_cell_chars(self.board.cell_type[self.y, self.x:self.x+1], self.board.pheromone[self.y, self.x:self.x+1])[0])
     
 
 class Board:
@@ -78,155 +253,100 @@ class Board:
     Class to represent the board on which the ants walk
     '''
     def __init__(self, n: int, evaporation_factor:float=0.001) -> None:
-        self.cells = [[Cell(x, y) for x in range(n)] for y in range(n)]
         self.n = n
-        self.cells[0][0].set_type(CellType.START)
-        self.cells[n-1][n-1].set_type(CellType.FOOD)
+        # The cells are stored as arrays indexed by [y, x]
+        self.pheromone = np.full((n, n), MINIMUM_EVAPORATE_PHEROMONE, dtype=np.float32)
+        self.cell_type = np.full((n, n), _NORMAL, dtype=np.uint8)
+        self.cell_type[0, 0] = _START
+        self.cell_type[n-1, n-1] = _FOOD
         self.evaporation_factor = evaporation_factor
     
     def import_from_list(self, list_cell_types: list, evaporation_factor:float=0.001) -> None:
         self.n = len(list_cell_types)
-        self.cells = [[Cell(x, y, cell_type=CellType[list_cell_types[x][y]]) for x in range(self.n)] for y in range(self.n)]
+        to_code = np.vectorize(lambda name: CellType[name], otypes=[np.uint8])
+        # The list is indexed by [x][y]
+        self.cell_type = np.ascontiguousarray(to_code(np.array(list_cell_types)).T)
+        self.pheromone = np.full((self.n, self.n), MINIMUM_EVAPORATE_PHEROMONE, dtype=np.float32)
         self.evaporation_factor = evaporation_factor
 
     def set_random_walls(self, wall_probability: float) -> None:
-        for cell_row in self.cells:
-            for cell in cell_row:
-                if cell.get_type() == CellType.NORMAL:
-                    cell.set_type(CellType.WALL if random.random() <= wall_probability else CellType.NORMAL)
+        walls = (np.random.random((self.n, self.n)) <= wall_probability) & (self.cell_type == _NORMAL)
+        self.cell_type[walls] = _WALL
 
     def set_evaporation_factor(self, evaporation_factor: float) -> None:
         self.evaporation_factor = evaporation_factor
 
     def get_cells(self) -> list:
-        return self.cells
+        return [[Cell(self, x, y) for x in range(self.n)] for y in range(self.n)]
     
     def get_cell_in_position(self, position: tuple) -> Cell:
-        return self.cells[position[1]][position[0]]
+        return Cell(self, position[0], position[1])
             
     def get_neighbour_cells(self, position: tuple, jump:int=1) -> list:
         '''
         Returns a list of neighboring cells
         Jump > 1 can jump walls
         '''
+        if jump not in _OFFSETS_CACHE:
+            _OFFSETS_CACHE[jump] = _compute_offsets(jump)
+
         neighbour_cells = []
-        for i in range(-jump, jump+1):
-            for j in range(-jump, jump+1):
-                # Diagonal is not a neighbour and the same cell is not a neighbour
-                if (i != 0 and j != 0) or (i == 0 and j == 0):
-                    continue
-
-                new_x = position[0] + i
-                new_y = position[1] + j
-                
-                if 0 <= new_x < self.n and 0 <= new_y < self.n:
-                    neighbour_cell = self.cells[new_y][new_x]
-                    if not neighbour_cell.get_type() == CellType.WALL:
-                        neighbour_cells.append(neighbour_cell)
+        for i, j in _OFFSETS_CACHE[jump]:
+            new_x = position[0] + i
+            new_y = position[1] + j
+
+            if 0 <= new_x < self.n and 0 <= new_y < self.n:
+                if self.cell_type[new_y, new_x] != _WALL:
+                    neighbour_cells.append(Cell(self, new_x, new_y))
 
         return neighbour_cells
     
-    def evaporate(self) -> None:
-        for cell_row in self.cells:
-            for cell in cell_row:
-                # Evaporate, but with a value greater than MINIMUM_EVAPORATE_PHEROMONE
-                cell.set_pheromone(cell.get_pheromone() - self.evaporation_factor if cell.get_pheromone() - self.evaporation_factor > MINIMUM_EVAPORATE_PHEROMONE else MINIMUM_EVAPORATE_PHEROMONE)
+    def evaporate(self, rounds:int=1) -> None:
+        # Evaporate, but with a value greater than MINIMUM_EVAPORATE_PHEROMONE
+        np.subtract(self.pheromone, self.evaporation_factor*rounds, out=self.pheromone)
+        np.clip(self.pheromone, MINIMUM_EVAPORATE_PHEROMONE, MAXIMUM_PHEROMONE, out=self.pheromone)
+
+    def is_evaporated(self) -> bool:
+        '''
+        Returns if every cell is at the minimum pheromone evaporating can leave, so evaporating does nothing
+        '''
+        return self.pheromone.max() <= MINIMUM_EVAPORATE_PHEROMONE
 
     def export_to_list(self) -> list:
         '''
         Export the board as a list of cell list, but only with string defining its type
         '''
-        exported_cells = [list(map(lambda c: c.get_type().value, cell_row)) for cell_row in self.cells]
+        exported_cells = [[CellType(code).name for code in cell_type_row] for cell_type_row in self.cell_type.tolist()]
 
         return exported_cells
 
         
-    def __str__(self) -> str:
-        representation = ""
-        for cell_row in self.cells:
-            for cell in cell_row:
-                representation += str(cell)*2
-            representation += "\n"
+    def get_cell_chars(self) -> np.ndarray:
+        '''
+        Returns the representation of every cell, indexed by [y, x]
+        '''
+        return _cell_chars(self.cell_type, self.pheromone)
 
-        return representation[:-1]
+    def __str__(self) -> str:
+        return "\n".join("".join(cell_char_row) for cell_char_row in np.repeat(self.get_cell_chars(), 2, axis=1).tolist())
 
 class Ant:
     '''
     Class to represent ants 
+    It does not store its state, it reads the ant colony arrays
     '''
-    def __init__(self, pheromone_intensity:float, start_position:tuple=tuple((0, 0)), breed:AntBreed=AntBreed.MINOR) -> None:
-        self.start_position = start_position
-        self.position = start_position
-        # Store the path without cycles to return faster and get the path length
-        self.position_history_without_cycles = [start_position]
-        # Store every step to give less probability the cell already visited and find the food faster
-        self.position_history = [start_position]
-        self.returning_nest = False
-        self.pheromone_intensity = pheromone_intensity
-        self.breed = breed
-        self.path_length = None
-
-    def move(self, board: Board) -> None:
-        actual_cell = board.get_cell_in_position(self.position)
-
-        # If it is returning to the nest
-        if self.returning_nest:
-            self.return_nest(board)
-        # Return to the nest if finds food
-        elif actual_cell.get_type() == CellType.FOOD:
-            self.returning_nest = True
-            self.path_length = len(self.position_history_without_cycles)
-        else:
-            neighbour_cells = board.get_neighbour_cells(self.position)
-            count_neighbours = len(neighbour_cells)
-
-            if count_neighbours == 0: # There is no neigbour
-                print("ANTS ARE TRAPPED!")
-            elif count_neighbours == 1 and actual_cell.get_position() != self.start_position: # If ant finds a dead end, it changes the cell type to wall
-                actual_cell.set_type(CellType.WALL)
-                self.position = neighbour_cells[0].get_position()
-
-            else:
-                # More probability if there is pheromone
-                # Less probability if the ant has gone by there already
-                neighbour_cells_pheromone = [neighbour_cell.get_pheromone() if neighbour_cell.get_position() not in self.position_history else MINIMUM_PHEROMONE for neighbour_cell in neighbour_cells]
-
-                # Choose a weighted random neighbour cell. 
-                self.position = random.choices(neighbour_cells, neighbour_cells_pheromone)[0].get_position()
-
-                # To make the ant smarter, it will remember the first time it was in that cell, so it will not cycle
-                # list.index(<index>) only returns the first occurrence of <index> in the list
-                if self.get_position() in self.position_history:
-                    self.position_history = self.position_history[:self.position_history.index(self.get_position()) + 1]
-                else:
-                    # Store de position in history without cycles
-                    self.position_history_without_cycles.append(self.position)
-
-                # Store de position in history
-                self.position_history.append(self.position)
-    
-    def return_nest(self, board: Board, reason:Reason=Reason.FOOD) -> None:
-        actual_cell = board.get_cell_in_position(self.position)
-
-        # If the ant has returned home, reset
-        if self.position == self.start_position:
-            self.start_position = tuple((0, 0))
-            self.position = tuple((0, 0))
-            self.position_history = [tuple((0, 0))]
-            self.position_history_without_cycles = [tuple((0, 0))]
-            self.returning_nest = False
-            self.path_length = None
-        # The ant is returning
-        else:
-            self.position = self.position_history.pop()
+    __slots__ = ('ant_colony', 'index', 'breed')
 
-            # On the way back, the pheromone loses intensity, hence the multiplicative factor
-            if reason == Reason.FOOD:
-                actual_cell.set_pheromone(actual_cell.get_pheromone() + self.pheromone_intensity/self.path_length)
+    def __init__(self, ant_colony: 'AntColony', index: int, breed:AntBreed=AntBreed.MINOR) -> None:
+        self.ant_colony = ant_colony
+        self.index = index
+        self.breed = breed
 
+    def is_returning_nest(self) -> bool:
+        return bool(self.ant_colony.returning[self.index])
 
     def get_position(self) -> tuple:
-        return self.position
+        return tuple(self.ant_colony.positions[self.index].tolist())
 
     def __str__(self) -> str:
         representation = "+"
@@ -239,13 +359,83 @@ class Ant:
 class AntColony:
     '''
     Class to represent the ant colony
+    The state of the ants is stored as arrays indexed by ant, so all of them move at once
     '''
-    def __init__(self, length:int,  pheromone_intensity:float) -> None:
+    def __init__(self, length:int,  pheromone_intensity:float, board_size:int) -> None:
         self.length = length
-        self.ants = [Ant(pheromone_intensity) for _ in range(self.length)]
+        self.pheromone_intensity = pheromone_intensity
+        self.start_position = _ORIGIN
+        # Positions as (x, y)
+        self.positions = np.zeros((length, 2), dtype=np.int32)
+        self.positions[:] = self.start_position
+        self.returning = np.zeros(length, dtype=np.bool_)
+        self.path_length = np.zeros(length, dtype=np.int32)
+        # Store the path without cycles to return faster and get the path length
+        # Every path is a stack of positions, it can not be longer than the cells in the board
+        self.path_xs = np.empty((length, board_size*board_size + 1), dtype=np.int16)
+        self.path_ys = np.empty_like(self.path_xs)
+        self.path_xs[:, 0], self.path_ys[:, 0] = self.start_position
+        # Number of cells in every path, the top of the stacks
+        self.path_sizes = np.ones(length, dtype=np.int32)
+        # Cells in the path, to give less probability the cell already visited and find the food faster
+        # Indexed by [ant, y, x]
+        self.visited = np.zeros((length, board_size, board_size), dtype=np.bool_)
+        self.visited[:, self.start_position[1], self.start_position[0]] = True
+        self.ants = [Ant(self, index) for index in range(self.length)]
+
+    def step(self, board: Board) -> None:
+        '''
+        Move every ant one cell
+        '''
+        xs = self.positions[:, 0].copy()
+        ys = self.positions[:, 1].copy()
+        returning = self.returning.copy()
+        at_start = (xs == self.start_position[0]) & (ys == self.start_position[1])
+        at_food = board.cell_type[ys, xs] == _FOOD
+
+        # Return to the nest if finds food
+        found_food = np.flatnonzero(~returning & at_food)
+        self.returning[found_food] = True
+        self.path_length[found_food] = self.path_sizes[found_food]
+
+        # If the ant has returned home, reset
+        at_home = np.flatnonzero(returning & at_start)
+        self.returning[at_home] = False
+        self.path_length[at_home] = 0
+        self.path_sizes[at_home] = 1
+        self.visited[at_home] = False
+        self.visited[at_home, self.start_position[1], self.start_position[0]] = True
+
+        # The ant is returning
+        walking_back = np.flatnonzero(returning & ~at_start)
+        if len(walking_back) > 0:
+            # On the way back, the pheromone loses intensity, hence the multiplicative factor
+            back_ys, back_xs = ys[walking_back], xs[walking_back]
+            # The deposits are positive, so clipping to the maximum once after adding all of them gives the same as clipping every one
+            np.add.at(board.pheromone, (back_ys, back_xs), self.pheromone_intensity/self.path_length[walking_back])
+            board.pheromone[back_ys, back_xs] = np.minimum(board.pheromone[back_ys, back_xs], MAXIMUM_PHEROMONE)
+            self.path_sizes[walking_back] -= 1
+            self.positions[walking_back, 0] = self.path_xs[walking_back, self.path_sizes[walking_back]]
+            self.positions[walking_back, 1] = self.path_ys[walking_back, self.path_sizes[walking_back]]
+
+        exploring = np.flatnonzero(~returning & ~at_food)
+        if len(exploring) == 0:
+            return
+
+        # Choose a weighted random neighbour cell, the ants are independent so they move in parallel
+        count_neighbours = _move_exploring_ants(self.positions, exploring, self.visited, board.pheromone, board.cell_type, board.n, np.random.random(len(exploring)))
+
+        if np.any(count_neighbours == 0): # There is no neigbour
+            print("ANTS ARE TRAPPED!")
+
+        # If ant finds a dead end, it changes the cell type to wall
+        dead_end = exploring[(count_neighbours == 1) & ~at_start[exploring]]
+        board.cell_type[ys[dead_end], xs[dead_end]] = _WALL
+
+        _store_positions(self.positions, exploring[count_neighbours > 0], self.visited, self.path_xs, self.path_ys, self.path_sizes)
     
     def get_ant_positions(self) -> list:
-        return [ant.get_position() for ant in self.ants]
+        return [tuple(position) for position in self.positions.tolist()]
     
     def get_ants(self) -> list:
         return self.ants
@@ -253,6 +443,16 @@ class AntColony:
     def get_ant_in_position(self, position:tuple) -> list:
         return [ant for ant in self.ants if ant.get_position() == position]
 
+    def get_ants_by_position(self) -> dict:
+        '''
+        Returns the list of ants in every position with ants
+        '''
+        ants_by_position = {}
+        for ant, position in zip(self.ants, self.get_ant_positions()):
+            ants_by_position.setdefault(position, []).append(ant)
+
+        return ants_by_position
+
     def __str__(self) -> str:
         return "[" + ", ".join(str(ant) for ant in self.ants) + "]"
     
@@ -267,45 +467,84 @@ class AntSolver:
         self.board.set_random_walls(random_walls)
         # The intensity will be dividen between all the cell in the shotest path, and the best path will have minimun board_size*2 steps
         pheromone_intensity=board_size*0.7
-        self.ant_colony = AntColony(ant_size, pheromone_intensity)
+        self.ant_colony = AntColony(ant_size, pheromone_intensity, board_size)
+        # Rounds already moved but not evaporated yet
+        self.pending_evaporations = 0
         
     
     def move(self) -> None:
-        for ant in self.ant_colony.get_ants():
-            ant.move(self.board)
-        self.board.evaporate()
+        self.ant_colony.step(self.board)
+        self.pending_evaporations += 1
+        # Evaporating does nothing while the board is evaporated, and it stays so until a returning ant deposits pheromone
+        if self.ant_colony.returning.any() or self.pending_evaporations >= MAXIMUM_PENDING_EVAPORATIONS or not self.board.is_evaporated():
+            self.evaporate_pending()
+
+    def evaporate_pending(self) -> None:
+        if self.pending_evaporations > 0:
+            self.board.evaporate(self.pending_evaporations)
+            self.pending_evaporations = 0
     
     def get_board(self) -> Board:
+        self.evaporate_pending()
         return self.board
 
     def set_board(self, board_list) -> None:
         self.board.import_from_list(board_list, evaporation_factor=self.evaporation_factor)
+        self.pending_evaporations = 0
+        # The ants have to know the new board size
+        self.ant_colony = AntColony(self.ant_colony.length, self.ant_colony.pheromone_intensity, self.board.n)
 
     def __str__(self) -> str:
-        representation = ""
-        
-        cells = self.board.get_cells()
-        ant_positions = self.ant_colony.get_ant_positions()
-
-        for cell_row in cells:
-            for cell in cell_row:
-                cell_position = cell.get_position()
-                ant_counts_position = ant_positions.count(cell_position) # How many ants in position
+        ants_by_position = self.ant_colony.get_ants_by_position()
+
+        rows = []
+        for y, cell_char_row in enumerate(self.board.get_cell_chars().tolist()):
+            row = []
+            for x, cell_char in enumerate(cell_char_row):
+                ants_in_position = ants_by_position.get((x, y), ())
+                ant_counts_position = len(ants_in_position) # How many ants in position
                 if ant_counts_position == 0: # No ants in position
-                    representation += str(cell)*2
+                    row.append(cell_char*2)
                 elif ant_counts_position == 1: # Print breed if in the cell there is just one ant
-                    representation += str(self.ant_colony.get_ant_in_position(cell_position)[0]) + " "
+                    row.append(str(ants_in_position[0]) + " ")
                 elif ant_counts_position < 10: 
-                    representation += str(ant_counts_position) + " " 
+                    row.append(str(ant_counts_position) + " ")
                 elif 10 <= ant_counts_position < 100:
-                    representation += str(ant_counts_position)
+                    row.append(str(ant_counts_position))
                 else:
-                    representation += "!!"
-            representation += "\n"
+                    row.append("!!")
+            rows.append("".join(row))
+
+        return "\n".join(rows)
 
-        return representation[:-1]
 
+def run_simulation(config: dict) -> Board:
+    '''
+    Run an independent simulation and return its board after the rounds
+    The config has the AntSolver arguments and optionally "rounds" (1000 by default), "board" (a custom board) and "seed"
+    '''
+    config = dict(config)
+    rounds = config.pop("rounds", 1000)
+    custom_board = config.pop("board", None)
+    if "seed" in config:
+        np.random.seed(config.pop("seed"))
+
+    ant_solver = AntSolver(**config)
+    if custom_board is not None:
+        ant_solver.set_board(custom_board)
+    for _ in range(rounds):
+        ant_solver.move()
+
+    return ant_solver.get_board()
 
+def run_simulations(configs: list, processes:int=None) -> list:
+    '''
+    Run every simulation config in its own process, by default as many processes as cpus
+    '''
+    # Spawned processes, forking a process that already ran the parallel kernels hangs the threading layer
+    # Every process seeds its own random state
+    with multiprocessing.get_context("spawn").Pool(processes, initializer=np.random.seed) as pool:
+        return pool.map(run_simulation, configs)
 
 
 if __name__ == '__main__':
@@ -345,7 +584,8 @@ if __name__ == '__main__':
         print()
         # print(ant_solver.get_board())
         time.sleep(seconds_watch)
-        os.system('clear')
+        sys.stdout.write(_CLEAR_SCREEN)
+        sys.stdout.flush()
         ant_solver.move()
 
     # Comment this if you don't want to see the original and the solved board after 1000 rounds
@@ -356,6 +596,13 @@ if __name__ == '__main__':
     # print()
     # print(ant_solver.get_board())
 
+    # Uncomment this if you want to compare the solved boards with different evaporation factors, each one is solved in parallel
+    # configs = [{"ant_size": 20, "evaporation_factor": evaporation_factor, "board": custom_board, "rounds": 1000} for evaporation_factor in (0.001, 0.003, 0.006, 0.01)]
+    # for config, board in zip(configs, run_simulations(configs)):
+    #     print(config["evaporation_factor"])
+    #     print(board)
+    #     print()
+
 
 
 
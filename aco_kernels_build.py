@@ -0,0 +1,21 @@
+'''
+Compile the ant kernels ahead of time into the aco_kernels module, so aco_algorithm does not compile them on every run
+It needs Numba, run it again after changing the kernels:
+
+    python3 ./aco_kernels_build.py
+'''
+import os
+
+from numba.pycc import CC
+
+import aco_algorithm
+
+cc = CC('aco_kernels')
+cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+
+# The kernels are compiled from the same Python code that aco_algorithm compiles just in time
+cc.export('move_exploring_ants', 'i4[:](i4[:,:], i8[:], b1[:,:,:], f4[:,:], u1[:,:], i8, f8[:])')(aco_algorithm._move_exploring_ants_jit.py_func)
+cc.export('store_positions', 'void(i4[:,:], i8[:], b1[:,:,:], i2[:,:], i2[:,:], i4[:])')(aco_algorithm._store_positions_jit.py_func)
+
+if __name__ == '__main__':
+    cc.compile()